@@ -2,17 +2,120 @@
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 import os
+import asyncio
+import atexit
 import xml.etree.ElementTree as ET
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import logging
+import mmap
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
+# stdout carries the MCP stdio protocol, so progress goes to logging; set LOG_LEVEL=DEBUG to see it.
+# Only this module's logger is configured so FastMCP's own logging setup stays in charge of output.
+log = logging.getLogger(__name__)
+log.setLevel(os.getenv("LOG_LEVEL", "WARNING").upper())
+
 # Create an MCP server
 mcp = FastMCP("Demo")
 
 claude_api_key = os.getenv("ANTHROPIC_API_KEY")
 
+# Request logging to log.text is opt-in so normal calls skip the serialization cost
+LOG_ENABLED = os.getenv("LOG_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Reuse TCP/TLS connections to the Claude API across tool calls
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+
+# Static parts of every Claude request; only the messages change per call
+_HEADERS = {
+    "x-api-key": claude_api_key,
+    "anthropic-version": "2023-06-01"
+}
+
+_SYSTEM_PROMPT = "You are a quality assurance assistant. Analyze code snippets for compatibility with library versions and generates unit tests in seperate java file"
+
+_BASE_PAYLOAD = {
+    "model": "claude-3-7-sonnet-20250219",
+    "system": _SYSTEM_PROMPT,
+    "max_tokens": 2000,
+    "temperature": 0,
+}
+
+# Number of code snippets included in the compatibility prompt, per library
+MAX_SNIPPETS = 5
+
+# Output token cap for batched checks, which scale max_tokens by library count
+BATCH_MAX_TOKENS = 8192
+
+# Seconds to wait for a non-streaming response of the base max_tokens; larger
+# batched responses get a proportionally longer timeout
+CLAUDE_TIMEOUT = 120
+
+# Imports that indicate code uses a Spring library
+SPRING_IMPORTS = (
+    "org.springframework", 
+    "springframework",
+    "@Controller",
+    "@RestController",
+    "@Service",
+    "@Repository",
+    "@Component",
+    "@RequestMapping"
+)
+
+POM_NAMESPACE = "http://maven.apache.org/POM/4.0.0"
+
+# Compiled once; lxml evaluates the dependency lookup in C
+if etree is not None:
+    _DEPENDENCY_VERSION_XPATH = etree.XPath(
+        "//ns:dependency[ns:artifactId=$name]/ns:version", namespaces={'ns': POM_NAMESPACE}
+    )
+
+# Extensions (without the dot) of files scanned for library usage
+_SOURCE_EXTENSIONS = frozenset({'java', 'xml', 'properties', 'yml', 'yaml'})
+
+# VCS, IDE and tool directories that are never scanned
+_SKIP_DIRS = frozenset({'.git', 'node_modules', '.idea', '.mvn', '.gradle'})
+
+# Build output directories, only skipped next to a build file since packages may share these names
+_BUILD_OUTPUT_DIRS = frozenset({'target', 'build', 'out'})
+_BUILD_FILES = frozenset({'pom.xml', 'build.gradle', 'build.gradle.kts'})
+
+# Parsed pom.xml trees keyed by path, stored as (mtime_ns, tree)
+_pom_cache = {}
+
+# Bytes of each file read for matching and kept for its prompt snippet
+MAX_SNIPPET_BYTES = 2000
+
+# File reads during scans are I/O-bound, so use more threads than cores
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
 # Add an addition tool
 @mcp.tool()
 def add(a: int, b: int) -> int:
@@ -34,7 +137,46 @@ def code_directory(path: str):
     if not os.path.isdir(path):
         return {"status": "error", "message": "Directory does not exist"}
     
-    return {"status": "success", "path": path, "files": os.listdir(path)}
+    with os.scandir(path) as it:
+        files = [entry.name for entry in it]
+    
+    return {"status": "success", "path": path, "files": files}
+
+
+def _load_pom(pom_path):
+    """Parse pom.xml, reusing the cached tree while the file is unchanged"""
+    mtime_ns = os.stat(pom_path).st_mtime_ns
+    cached = _pom_cache.get(pom_path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    
+    if etree is not None:
+        tree = etree.parse(pom_path)
+    else:
+        # Register the namespace
+        ET.register_namespace('', POM_NAMESPACE)
+        tree = ET.parse(pom_path)
+    _pom_cache[pom_path] = (mtime_ns, tree)
+    return tree
+
+
+def _find_dependency_version(tree, library_name):
+    """Return the <version> element of the first versioned dependency on library_name, or None"""
+    if etree is not None:
+        hits = _DEPENDENCY_VERSION_XPATH(tree, name=library_name)
+        return hits[0] if hits else None
+    
+    # Need to handle namespaces in Maven POM
+    namespace = {'ns': POM_NAMESPACE}
+    
+    for dependency in tree.getroot().findall(".//ns:dependency", namespace):
+        artifact_id = dependency.find("ns:artifactId", namespace)
+        
+        if artifact_id is not None and artifact_id.text == library_name:
+            version = dependency.find("ns:version", namespace)
+            if version is not None:
+                return version
+    return None
 
 
 # Tool to update library version in pom.xml
@@ -47,34 +189,20 @@ def update_library_version(code_dir: str, library_name: str, new_version: str):
         return {"status": "error", "message": "pom.xml not found in the directory"}
     
     try:
-        # Register the namespace
-        ET.register_namespace('', "http://maven.apache.org/POM/4.0.0")
-        tree = ET.parse(pom_path)
-        root = tree.getroot()
-        
-        # Need to handle namespaces in Maven POM
-        namespace = {'ns': 'http://maven.apache.org/POM/4.0.0'}
+        tree = _load_pom(pom_path)
         
         # Find the dependency
-        found = False
-        old_version = None
+        version = _find_dependency_version(tree, library_name)
         
-        for dependency in root.findall(".//ns:dependency", namespace):
-            artifact_id = dependency.find("ns:artifactId", namespace)
-            
-            if artifact_id is not None and artifact_id.text == library_name:
-                version = dependency.find("ns:version", namespace)
-                if version is not None:
-                    old_version = version.text
-                    version.text = new_version
-                    found = True
-                    break
-        
-        if not found:
+        if version is None:
             return {"status": "error", "message": f"Library {library_name} not found in pom.xml"}
         
+        old_version = version.text
+        version.text = new_version
+        
         # Save the changes
         tree.write(pom_path, encoding='utf-8', xml_declaration=True)
+        _pom_cache[pom_path] = (os.stat(pom_path).st_mtime_ns, tree)
         
         return {
             "status": "success", 
@@ -82,136 +210,355 @@ def update_library_version(code_dir: str, library_name: str, new_version: str):
         }
     
     except Exception as e:
+        # The cached tree may hold an edit that never reached the file
+        _pom_cache.pop(pom_path, None)
         return {"status": "error", "message": str(e)}
 
 
+def _dump_json(obj):
+    """Serialize obj to compact JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _log_worker():
+    """Write queued request logs to log.text until a None sentinel arrives"""
+    while True:
+        entry = _log_queue.get()
+        if entry is None:
+            break
+        code_snippets, prompt, payload = entry
+        _LOG.write(f"Code Snippet List: {code_snippets}\n")
+        _LOG.write(f"Prompt: {prompt}\n")
+        _LOG.write("\n================================================\n================================================\n")
+        _LOG.write(f"Payload: {_dump_json(payload)}\n")
+        if _log_queue.empty():
+            _LOG.flush()
+    _LOG.close()
+
+
+def _stop_log_worker():
+    """Drain the log queue and close log.text at interpreter exit"""
+    _log_queue.put(None)
+    _log_thread.join()
+
+
+if LOG_ENABLED:
+    # Open the log once and keep the handle for the life of the server
+    _LOG = open("log.text", "a", buffering=1 << 16)
+    _log_queue = queue.Queue()
+    _log_thread = threading.Thread(target=_log_worker, name="log-writer", daemon=True)
+    _log_thread.start()
+    atexit.register(_stop_log_worker)
+
+
+def _iter_source_files(root):
+    """Yield paths of candidate source/config files under root using os.scandir"""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        files = []
+        dirs = []
+        is_module_root = False
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Tool metadata would only pollute the results
+                        if entry.name not in _SKIP_DIRS:
+                            dirs.append(entry)
+                    else:
+                        is_module_root = is_module_root or entry.name in _BUILD_FILES
+                        _, dot, extension = entry.name.rpartition('.')
+                        if dot and extension in _SOURCE_EXTENSIONS:
+                            files.append(entry)
+        except OSError as e:
+            log.warning("Error scanning directory %s: %s", current, e)
+        
+        # Build output of a Maven/Gradle module holds generated files, not real source
+        for entry in dirs:
+            if not (is_module_root and entry.name in _BUILD_OUTPUT_DIRS):
+                stack.append(entry.path)
+        
+        # Inode order tracks on-disk layout, which cuts seeks on spinning disks
+        files.sort(key=lambda entry: entry.inode())
+        for entry in files:
+            yield entry.path
+
+
+def _imports_for(library_name):
+    """Return the import/annotation patterns that indicate use of a library"""
+    # For Spring libraries, check for these imports
+    if "spring" in library_name.lower():
+        return SPRING_IMPORTS
+    return ()
+
+
+class _LibraryMatcher:
+    """Find which libraries a text references with a single pass over it
+    
+    Libraries whose names are prefixes of one another are both found:
+    
+    >>> matcher = _LibraryMatcher({"commons-lang": ("commons-lang",), "commons-lang3": ("commons-lang3",)})
+    >>> sorted(matcher.find("uses commons-lang3")), sorted(matcher.find_bytes(b"uses commons-lang3"))
+    (['commons-lang', 'commons-lang3'], ['commons-lang', 'commons-lang3'])
+    """
+    
+    def __init__(self, library_patterns):
+        self.libraries = tuple(library_patterns)
+        self._library_patterns = dict(library_patterns)
+        self._pattern_libraries = {}
+        for library, patterns in library_patterns.items():
+            for pattern in patterns:
+                self._pattern_libraries.setdefault(pattern, []).append(library)
+        
+        # Longest first, so a pattern is not hidden by a shorter one it starts with
+        patterns = sorted(self._pattern_libraries, key=len, reverse=True)
+        
+        # Memory-mapped file tails are bytes, so keep a bytes regex for them
+        self._bytes_regex = re.compile(b"|".join(re.escape(p.encode()) for p in patterns))
+        self._automaton = None
+        self._regex = None
+        
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for pattern in patterns:
+                self._automaton.add_word(pattern, pattern)
+            self._automaton.make_automaton()
+        else:
+            # A single alternation still scans the text once instead of once per pattern
+            self._regex = re.compile("|".join(map(re.escape, patterns)))
+    
+    def _collect(self, hits):
+        """Map each library to the first of its patterns in hits, stopping once all are found"""
+        found = {}
+        for pattern in hits:
+            for library in self._pattern_libraries[pattern]:
+                found.setdefault(library, pattern)
+            if len(found) == len(self.libraries):
+                break
+        return found
+    
+    def _recheck(self, found, buffer, encode):
+        """Search directly for libraries whose patterns may have been hidden inside a longer match"""
+        # Regex matches never overlap, but a pattern can only be hidden if something matched
+        if not found or len(found) == len(self.libraries):
+            return found
+        for library, patterns in self._library_patterns.items():
+            if library in found:
+                continue
+            for pattern in patterns:
+                if buffer.find(pattern.encode() if encode else pattern) != -1:
+                    found[library] = pattern
+                    break
+        return found
+    
+    def find(self, text):
+        """Return {library: matched pattern} for the libraries referenced in text"""
+        if self._automaton is not None:
+            # The automaton reports overlapping matches itself
+            return self._collect(pattern for _, pattern in self._automaton.iter(text))
+        return self._recheck(self._collect(hit.group() for hit in self._regex.finditer(text)), text, False)
+    
+    def find_bytes(self, buffer):
+        """Return {library: matched pattern} for the libraries referenced in a bytes-like buffer"""
+        found = self._collect(hit.group().decode() for hit in self._bytes_regex.finditer(buffer))
+        return self._recheck(found, buffer, True)
+
+
+def _is_xml_dependency(buffer, library_name):
+    """Check whether a config file buffer declares a Spring or library dependency"""
+    if buffer.find(b'dependency') == -1:
+        return False
+    return re.search(b'spring|' + re.escape(library_name.lower().encode()), buffer, re.IGNORECASE) is not None
+
+
+def _read_and_match(file_path, code_dir, matcher, xml_libraries):
+    """Read a file and return (relative_path, snippet, libraries) for the libraries it uses, or None
+    
+    xml_libraries are the libraries without import patterns, which are
+    also matched by a broader dependency check on .xml files.
+    """
+    file = os.path.basename(file_path)
+    if not file.endswith('.xml'):
+        xml_libraries = ()
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(MAX_SNIPPET_BYTES + 1)
+            snippet = head[:MAX_SNIPPET_BYTES].decode('utf-8', errors='ignore')
+            truncated = len(head) > MAX_SNIPPET_BYTES
+            
+            # Check the library names and relevant imports in a single pass
+            found = matcher.find(snippet)
+            
+            if truncated and len(found) < len(matcher.libraries):
+                # Scan the rest of the file without loading it into memory
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    found = {**matcher.find_bytes(mm), **found}
+                    xml_found = [lib for lib in xml_libraries if lib not in found and _is_xml_dependency(mm, lib)]
+            else:
+                xml_found = [lib for lib in xml_libraries if lib not in found and _is_xml_dependency(head, lib)]
+    except Exception as e:
+        log.warning("Error reading file %s: %s", file, e)
+        return None
+    
+    for library, pattern in found.items():
+        if pattern == library:
+            log.debug("Found direct reference to %s in %s", library, file)
+        else:
+            log.debug("Found import %s in %s", pattern, file)
+    
+    # For pom.xml and other config files, check more broadly
+    if xml_found:
+        log.debug("Found dependency in %s", file)
+    
+    libraries = (*found, *xml_found)
+    if not libraries:
+        return None
+    
+    relative_path = os.path.relpath(file_path, code_dir)
+    # Limit snippet size if too large
+    if truncated:
+        snippet += "... (truncated)"
+    log.debug("Added %s to code snippets", relative_path)
+    return relative_path, snippet, libraries
+
+
+def _iter_code_snippets(code_dir, library_names):
+    """Yield (relative_path, snippet, libraries) for files that use any of the libraries, reading them concurrently"""
+    matcher = _LibraryMatcher({name: (name, *_imports_for(name)) for name in library_names})
+    # Config files are only checked broadly for libraries without import patterns
+    xml_libraries = tuple(name for name in library_names if not _imports_for(name))
+    executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS)
+    try:
+        # Results are taken in submission order so snippet selection follows walk order
+        pending = deque()
+        for file_path in _iter_source_files(code_dir):
+            pending.append(executor.submit(_read_and_match, file_path, code_dir, matcher, xml_libraries))
+            if len(pending) >= SCAN_WORKERS * 2:
+                result = pending.popleft().result()
+                if result is not None:
+                    yield result
+        
+        while pending:
+            result = pending.popleft().result()
+            if result is not None:
+                yield result
+    finally:
+        # Stop reading files whose content will never reach the prompt
+        executor.shutdown(cancel_futures=True)
+
+
+def _collect_code_snippets(code_dir, library_names):
+    """Return up to MAX_SNIPPETS code snippets per library, in the order of library_names
+    
+    Scans are not cached across tool calls: source edits between checks
+    must reach the next prompt, and fingerprinting the tree would cost
+    as much as the early-exit scan itself.
+    """
+    buckets = {name: [] for name in library_names}
+    snippets = _iter_code_snippets(code_dir, library_names)
+    try:
+        for relative_path, snippet, libraries in snippets:
+            for library in libraries:
+                if len(buckets[library]) < MAX_SNIPPETS:
+                    buckets[library].append((relative_path, snippet))
+            if all(len(bucket) >= MAX_SNIPPETS for bucket in buckets.values()):
+                break
+    finally:
+        snippets.close()
+    return tuple(tuple(buckets[name]) for name in library_names)
+
+
+def _read_pom_fallback(pom_path):
+    """Return pom.xml as the only code snippet, for when no files use a library"""
+    # If no specific files found, include at least the pom.xml as context
+    if os.path.exists(pom_path):
+        try:
+            with open(pom_path, 'r', encoding='utf-8') as f:
+                pom_content = f.read()
+            log.debug("Added pom.xml as fallback")
+            return [("pom.xml", pom_content)]
+        except Exception as e:
+            log.warning("Error reading pom.xml: %s", e)
+    return []
+
+
+def _format_snippets(code_snippets):
+    """Render (file, snippet) pairs as prompt text"""
+    return "".join(f"--- {file} ---\n{snippet}\n\n" for file, snippet in code_snippets[:MAX_SNIPPETS])
+
+
+def _user_message(context, question):
+    """Build the user message, marking the code context as a prompt-cache breakpoint"""
+    return {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": question},
+        ],
+    }
+
+
+async def _post_to_claude(payload, code_snippets, prompt, timeout=CLAUDE_TIMEOUT):
+    """Send a Messages API request from a worker thread and return the response"""
+    if LOG_ENABLED:
+        # Formatted and written on the log thread so the API call is not held up
+        _log_queue.put((code_snippets, prompt, payload))
+    
+    return await asyncio.to_thread(
+        _session.post,
+        CLAUDE_API_URL,
+        headers=_HEADERS,
+        json=payload,
+        timeout=timeout
+    )
+
+
 # Tool to check compatibility using Claude 3.7 LLM
 @mcp.tool()
-def check_compatibility(code_dir: str, library_name: str, old_version: str, new_version: str):
+async def check_compatibility(code_dir: str, library_name: str, old_version: str, new_version: str):
     """Check if an upgraded library version is compatible with current code using Claude 3.7"""
     
-    # Collect relevant code snippets that use the library
-    code_snippets = []
-    imports_to_check = []
+    log.debug("Scanning for code using %s...", library_name)
     
-    # For Spring libraries, check for these imports
-    if "spring" in library_name.lower():
-        imports_to_check = [
-            "org.springframework", 
-            "springframework",
-            "@Controller",
-            "@RestController",
-            "@Service",
-            "@Repository",
-            "@Component",
-            "@RequestMapping"
-        ]
-    
-    print(f"Scanning for code using {library_name}...")
-    found_files = 0
-    
-    for root, _, files in os.walk(code_dir):
-        for file in files:
-            if file.endswith(('.java', '.xml', '.properties', '.yml', '.yaml')):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        
-                        # Check if this file uses the library
-                        is_relevant = False
-                        
-                        # First check exact library name
-                        if library_name in content:
-                            is_relevant = True
-                            print(f"Found direct reference to {library_name} in {file}")
-                        
-                        # Then check relevant imports for this library type
-                        elif imports_to_check:
-                            for import_str in imports_to_check:
-                                if import_str in content:
-                                    is_relevant = True
-                                    print(f"Found import {import_str} in {file}")
-                                    break
-                        
-                        # For pom.xml and other config files, check more broadly
-                        elif file.endswith('.xml') and 'dependency' in content and ('spring' in content.lower() or library_name.lower() in content.lower()):
-                            is_relevant = True
-                            print(f"Found dependency in {file}")
-                            
-                        if is_relevant:
-                            relative_path = os.path.relpath(file_path, code_dir)
-                            found_files += 1
-                            # Limit snippet size if too large
-                            if len(content) > 2000:
-                                content = content[:2000] + "... (truncated)"
-                            code_snippets.append((relative_path, content))
-                            print(f"Added {relative_path} to code snippets")
-                except Exception as e:
-                    print(f"Error reading file {file}: {str(e)}")
-    
-    print(f"Found {len(code_snippets)} relevant code files")
+    pom_path = os.path.join(code_dir, "pom.xml")
+    
+    # Scan in a worker thread so other tool calls keep running on the event loop
+    (code_snippets,) = await asyncio.to_thread(_collect_code_snippets, code_dir, (library_name,))
+    code_snippets = list(code_snippets)
+    
+    log.debug("Found %d relevant code files", len(code_snippets))
     
     if not code_snippets:
-        print(f"Warning: No code snippets found that use {library_name}")
-        
-        # If no specific files found, include at least the pom.xml as context
-        pom_path = os.path.join(code_dir, "pom.xml")
-        if os.path.exists(pom_path):
-            try:
-                with open(pom_path, 'r', encoding='utf-8') as f:
-                    pom_content = f.read()
-                code_snippets.append(("pom.xml", pom_content))
-                print("Added pom.xml as fallback")
-            except Exception as e:
-                print(f"Error reading pom.xml: {str(e)}")
+        log.warning("No code snippets found that use %s", library_name)
+        code_snippets = _read_pom_fallback(pom_path)
     
     # Prepare prompt for Claude 3.7
-    snippets_text = ""
-    for file, snippet in code_snippets[:5]:
-        snippets_text += f"--- {file} ---\n{snippet}\n\n"
+    snippets_text = _format_snippets(code_snippets)
     
-    prompt = f"""
-    I'm upgrading {library_name} from version {old_version} to {new_version}.
+    # The code context comes first so repeated checks on it can hit the prompt cache
+    context = f"""
+    Here are code snippets from our current code that use {library_name}:
     
-    Please analyze if the new version is compatible with our current code.
-    Focus on deprecated functions/methods, API changes, deprecated features, and breaking code changes.
+    {snippets_text}
+    """
     
-    Here are code snippets that use this library:
+    question = f"""
+    I'm upgrading {library_name} from version {old_version} to {new_version}.
     
-    {snippets_text}
+    Please analyze if the new version is compatible with the code above.
+    Focus on deprecated functions/methods, API changes, deprecated features, and breaking code changes.
     
     Provide a detailed compatibility assessment and suggestions for any necessary code changes.
     """
+    prompt = context + question
     
     # Call Claude 3.7 API (example implementation)
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": claude_api_key,
-            "anthropic-version": "2023-06-01"
-        }
-        
-        payload = {
-            "model": "claude-3-7-sonnet-20250219",
-            "system": "You are a quality assurance assistant. Analyze code snippets for compatibility with library versions and generates unit tests in seperate java file",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 2000,
-            "temperature": 0,
-        }
-        
-        with open("log.text", "a") as log_file:
-            log_file.write(f"Code Snippet List: {code_snippets}\n")
-            log_file.write(f"Prompt: {prompt}\n")
-            log_file.write("\n================================================\n================================================\n")
-            log_file.write(f"Payload: {json.dumps(payload, indent=2)}\n")
-
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers=headers,
-            data=json.dumps(payload),
-            timeout=120
-        )
+        payload = {**_BASE_PAYLOAD, "messages": [_user_message(context, question)]}
+        response = await _post_to_claude(payload, code_snippets, prompt)
         
         if response.status_code == 200:
             analysis = response.json()["content"][0]["text"]
@@ -226,4 +573,105 @@ def check_compatibility(code_dir: str, library_name: str, old_version: str, new_
             }
     
     except Exception as e:
-        return {"status": "error", "message": f"Error communicating with Claude API: {str(e)}"}
\ No newline at end of file
+        return {"status": "error", "message": f"Error communicating with Claude API: {str(e)}"}
+
+
+# Tool to check several library upgrades with one scan and one Claude request
+@mcp.tool()
+async def check_compatibility_batch(code_dir: str, upgrades: list[dict]):
+    """Check several upgraded library versions against current code in a single Claude 3.7 request
+    
+    Each upgrade is a {"library_name", "old_version", "new_version"} dict.
+    The analysis is returned as a dict keyed by library name.
+    """
+    if not upgrades:
+        return {"status": "error", "message": "No upgrades to check"}
+    
+    for upgrade in upgrades:
+        missing = [key for key in ("library_name", "old_version", "new_version") if key not in upgrade]
+        if missing:
+            return {"status": "error", "message": f"Upgrade {upgrade} is missing {', '.join(missing)}"}
+    
+    library_names = tuple(upgrade["library_name"] for upgrade in upgrades)
+    log.debug("Scanning for code using %s...", ", ".join(library_names))
+    
+    # One walk classifies files for every library in the batch
+    pom_path = os.path.join(code_dir, "pom.xml")
+    buckets = await asyncio.to_thread(_collect_code_snippets, code_dir, library_names)
+    
+    code_snippets = {}
+    pom_fallback = None
+    for library_name, snippets in zip(library_names, buckets):
+        log.debug("Found %d relevant code files for %s", len(snippets), library_name)
+        if not snippets:
+            log.warning("No code snippets found that use %s", library_name)
+            if pom_fallback is None:
+                pom_fallback = _read_pom_fallback(pom_path)
+            snippets = pom_fallback
+        code_snippets[library_name] = list(snippets)
+    
+    # Prepare prompt for Claude 3.7
+    upgrades_text = "\n".join(
+        f"    - {upgrade['library_name']} from version {upgrade['old_version']} to {upgrade['new_version']}"
+        for upgrade in upgrades
+    )
+    sections_text = "".join(
+        f"=== {library_name} ===\n{_format_snippets(snippets)}"
+        for library_name, snippets in code_snippets.items()
+    )
+    
+    # The code context comes first so repeated checks on it can hit the prompt cache
+    context = f"""
+    Here are code snippets from our current code that use each library:
+    
+    {sections_text}
+    """
+    
+    question = f"""
+    I'm upgrading these libraries:
+{upgrades_text}
+    
+    Please analyze if each new version is compatible with the code above.
+    Focus on deprecated functions/methods, API changes, deprecated features, and breaking code changes.
+    
+    Provide a detailed compatibility assessment and suggestions for any necessary code changes for each library.
+    Respond with only a JSON object whose keys are the library names and whose values are the assessments.
+    """
+    prompt = context + question
+    
+    # Call Claude 3.7 API (example implementation)
+    try:
+        max_tokens = min(_BASE_PAYLOAD["max_tokens"] * len(code_snippets), BATCH_MAX_TOKENS)
+        payload = {
+            **_BASE_PAYLOAD,
+            "max_tokens": max_tokens,
+            "messages": [_user_message(context, question)],
+        }
+        timeout = CLAUDE_TIMEOUT * max(1, max_tokens / _BASE_PAYLOAD["max_tokens"])
+        response = await _post_to_claude(payload, code_snippets, prompt, timeout)
+        
+        if response.status_code != 200:
+            return {
+                "status": "error", 
+                "message": f"Failed to get response from Claude API: {response.text}"
+            }
+        
+        text = response.json()["content"][0]["text"]
+    
+    except Exception as e:
+        return {"status": "error", "message": f"Error communicating with Claude API: {str(e)}"}
+    
+    # Claude may wrap the JSON object in prose or a code fence
+    try:
+        analysis = json.loads(text[text.index("{"):text.rindex("}") + 1])
+    except ValueError:
+        return {
+            "status": "error",
+            "message": "Claude API response was not a JSON object",
+            "response": text
+        }
+    
+    return {
+        "status": "success",
+        "compatibility_analysis": analysis
+    }